@@ -1,7 +1,51 @@
+import functools
 import itertools
 import random
 
 
+def iter_bits(mask):
+    """
+    Yields each set bit of an integer bitmask as a single-bit mask.
+    """
+    while mask:
+        bit = mask & -mask
+        yield bit
+        mask ^= bit
+
+
+@functools.lru_cache(maxsize=None)
+def board_neighbors(height, width):
+    """
+    Returns, for each board index of a height x width board,
+    the board indices of the in-bounds cells that are within
+    one row and column of that cell, not including the cell itself.
+    Computed once per board shape and shared by all games.
+    """
+    neighbors = []
+    for i in range(height):
+        for j in range(width):
+            neighbors.append(tuple(
+                x * width + y
+                for x in range(max(i - 1, 0), min(i + 2, height))
+                for y in range(max(j - 1, 0), min(j + 2, width))
+                if (x, y) != (i, j)
+            ))
+    return tuple(neighbors)
+
+
+@functools.lru_cache(maxsize=None)
+def neighbor_masks(height, width):
+    """
+    Returns, for each bit position of a height x width board,
+    the bitmask of the neighbors of that cell.
+    Computed once per board shape and shared by all AIs.
+    """
+    return tuple(
+        sum(1 << index for index in neighbors)
+        for neighbors in board_neighbors(height, width)
+    )
+
+
 class Minesweeper():
     """
     Minesweeper game representation
@@ -14,43 +58,39 @@ class Minesweeper():
         self.width = width
         self.mines = set()
 
-        # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
-
-        # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
+        # Initialize an empty field with no mines,
+        # stored flat with cell (i, j) at index i * width + j
+        self.board = bytearray(self.height * self.width)
+
+        # Add mines randomly, drawing distinct cells in one go
+        for index in random.sample(range(height * width), mines):
+            self.mines.add(divmod(index, width))
+            self.board[index] = 1
 
         # At first, player has found no mines
         self.mines_found = set()
 
+        # Board indices of the cells within one row and column
+        # of each cell, not including the cell itself
+        self.neighbors = board_neighbors(height, width)
+
     def print(self):
         """
         Prints a text-based representation
         of where mines are located.
         """
+        separator = "--" * self.width + "-"
+        rows = []
         for i in range(self.height):
-            print("--" * self.width + "-")
-            for j in range(self.width):
-                if self.board[i][j]:
-                    print("|X", end="")
-                else:
-                    print("| ", end="")
-            print("|")
-        print("--" * self.width + "-")
+            rows.append(separator)
+            row = self.board[i * self.width:(i + 1) * self.width]
+            rows.append("".join("|X" if mine else "| " for mine in row) + "|")
+        rows.append(separator)
+        print("\n".join(rows))
 
     def is_mine(self, cell):
         i, j = cell
-        return self.board[i][j]
+        return bool(self.board[i * self.width + j])
 
     def nearby_mines(self, cell):
         """
@@ -58,24 +98,9 @@ class Minesweeper():
         within one row and column of a given cell,
         not including the cell itself.
         """
-
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
-
-        return count
+        i, j = cell
+        board = self.board
+        return sum(board[n] for n in self.neighbors[i * self.width + j])
 
     def won(self):
         """
@@ -89,62 +114,83 @@ class Sentence():
     Logical statement about a Minesweeper game
     A sentence consists of a set of board cells,
     and a count of the number of those cells which are mines.
+
+    The set of cells is stored as an integer bitmask,
+    where cell (i, j) is bit i * width + j.
     """
 
+    # Fixed attribute slots make the attribute lookups
+    # in the inference loops cheaper than a per-instance dict
+    __slots__ = ("cells", "count")
+
     def __init__(self, cells, count):
-        self.cells = set(cells)
+        self.cells = cells
         self.count = count
 
     def __eq__(self, other):
         return self.cells == other.cells and self.count == other.count
 
     def __str__(self):
-        return f"{self.cells} = {self.count}"
+        return f"{bin(self.cells)} = {self.count}"
+
+    def signature(self):
+        """
+        Returns a hashable (cells, count) pair that is equal
+        for two sentences exactly when the sentences are equal.
+        """
+        return (self.cells, self.count)
 
     def known_mines(self):
         """
-        Returns the set of all cells in self.cells known to be mines.
+        Returns the bitmask of all cells in self.cells known to be mines.
         """
         # Any time the number of cells is equal to the count, 
         # we know that all of that sentence’s cells must be mines.
-        if len(self.cells) == self.count:
+        if self.cells.bit_count() == self.count:
             return self.cells
-        return set()
+        return 0
 
     def known_safes(self):
         """
-        Returns the set of all cells in self.cells known to be safe.
+        Returns the bitmask of all cells in self.cells known to be safe.
         """
         # Any time we have a sentence whose count is 0,
         # we know that all of that sentence’s cells must be safe.
         if self.count == 0:
             return self.cells
-        return set()
+        return 0
 
-    def mark_mine(self, cell):
+    def mark_mine(self, mask):
         """
         Updates internal knowledge representation given the fact that
-        a cell is known to be a mine.
+        the cells with bits set in mask are known to be mines.
         """
-        if cell in self.cells:
-            self.cells.remove(cell)
-            self.count -= 1
+        overlap = mask & self.cells
+        if overlap:
+            self.cells ^= overlap
+            self.count -= overlap.bit_count()
 
-    def mark_safe(self, cell):
+    def mark_safe(self, mask):
         """
         Updates internal knowledge representation given the fact that
-        a cell is known to be safe.
+        the cells with bits set in mask are known to be safe.
         """
-        # if cell in self.cells:
-        #     self.cells.remove(cell)
-        self.cells.discard(cell)
+        self.cells &= ~mask
 
 
 class MinesweeperAI():
     """
     Minesweeper game player
+
+    Sets of cells are stored as integer bitmasks,
+    where cell (i, j) is bit i * width + j.
     """
 
+    __slots__ = (
+        "height", "width", "moves_made", "mines", "safes", "knowledge",
+        "signatures", "version", "all_cells", "neighbor_mask",
+    )
+
     def __init__(self, height=8, width=8):
 
         # Set initial height and width
@@ -152,32 +198,174 @@ class MinesweeperAI():
         self.width = width
 
         # Keep track of which cells have been clicked on
-        self.moves_made = set()
+        self.moves_made = 0
 
         # Keep track of cells known to be safe or mines
-        self.mines = set()
-        self.safes = set()
+        self.mines = 0
+        self.safes = 0
 
         # List of sentences about the game known to be true
         self.knowledge = []
 
-    def mark_mine(self, cell):
+        # Signatures of the sentences in self.knowledge,
+        # for constant time membership tests
+        self.signatures = set()
+
+        # Bumped whenever the knowledge base or the known cells change
+        self.version = 0
+
+        # Bitmask with the bits of all cells on the board set
+        self.all_cells = (1 << (height * width)) - 1
+
+        # Bitmask of the neighbors of each cell, indexed by bit position
+        self.neighbor_mask = neighbor_masks(height, width)
+
+    def cell_to_bit(self, cell):
         """
-        Marks a cell as a mine, and updates all knowledge
-        to mark that cell as a mine as well.
+        Returns the bitmask with only the bit of the given cell set.
         """
-        self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        i, j = cell
+        return 1 << (i * self.width + j)
 
-    def mark_safe(self, cell):
+    def bits_to_cells(self, mask):
         """
-        Marks a cell as safe, and updates all knowledge
-        to mark that cell as safe as well.
+        Returns the set of (i, j) cells whose bits are set in mask.
         """
-        self.safes.add(cell)
+        cells = set()
+        for bit in iter_bits(mask):
+            cells.add(divmod(bit.bit_length() - 1, self.width))
+        return cells
+
+    def random_cell(self, mask):
+        """
+        Returns a cell chosen uniformly at random
+        among the cells whose bits are set in a non-empty mask.
+        """
+        skip = random.randrange(mask.bit_count())
+        bit = next(itertools.islice(iter_bits(mask), skip, None))
+        return divmod(bit.bit_length() - 1, self.width)
+
+    def mark_mine(self, bit):
+        """
+        Marks the cell with the given bit as a mine, and updates
+        all knowledge to mark that cell as a mine as well.
+        """
+        self.mark_mines(bit)
+
+    def mark_safe(self, bit):
+        """
+        Marks the cell with the given bit as safe, and updates
+        all knowledge to mark that cell as safe as well.
+        """
+        self.mark_safes(bit)
+
+    def mark_mines(self, mask):
+        """
+        Marks all cells with bits set in mask as mines, updating
+        all knowledge in a single pass over the knowledge base.
+        """
+        self.mark_cells(mask, 0)
+
+    def mark_safes(self, mask):
+        """
+        Marks all cells with bits set in mask as safe, updating
+        all knowledge in a single pass over the knowledge base.
+        """
+        self.mark_cells(0, mask)
+
+    def mark_cells(self, mines, safes):
+        """
+        Marks the cells with bits set in mines as mines and those
+        with bits set in safes as safe, updating all knowledge
+        in a single pass over the knowledge base.
+        """
+        # Known cells have already been removed from every sentence
+        mines &= ~self.mines
+        safes &= ~self.safes
+        if not (mines or safes):
+            return
+        self.mines |= mines
+        self.safes |= safes
+        self.version += 1
         for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+            sentence.mark_mine(mines)
+            sentence.mark_safe(safes)
+        self.update_signatures()
+
+    def update_signatures(self):
+        """
+        Rebuilds the signatures of the knowledge base
+        after its sentences have changed.
+        """
+        self.signatures = {sentence.signature() for sentence in self.knowledge}
+
+    def add_sentence(self, sentence):
+        """
+        Adds a sentence to the knowledge base
+        unless an equal sentence is already known.
+        """
+        signature = sentence.signature()
+        if signature not in self.signatures:
+            self.signatures.add(signature)
+            self.knowledge.append(sentence)
+            self.version += 1
+
+    def mark_mine_or_safe(self):
+        """
+        Marks any additional cells as safe or as mines
+        if it can be concluded based on the AI's knowledge base,
+        until no more cells can be marked.
+        """
+        while True:
+            # Collect the cells of every resolved sentence first,
+            # then mark all new cells in one pass
+            safes = 0
+            mines = 0
+            for sentence in self.knowledge:
+                safes |= sentence.known_safes()
+                mines |= sentence.known_mines()
+            version = self.version
+            self.mark_cells(mines, safes)
+            if self.version == version:
+                return
+
+    def infer(self):
+        """
+        Draws every conclusion the knowledge base allows:
+        marks cells that are known to be safe or mines and
+        adds any sentences that can be inferred from the others,
+        repeating until neither step changes anything.
+        """
+        while True:
+            version = self.version
+
+            # 4
+            self.mark_mine_or_safe()
+
+            self.knowledge = [sentence for sentence in self.knowledge if sentence.cells]
+            self.update_signatures()
+            # Remove all sentences from the knowledge base that have 0 cells
+
+            # 5) Any time we have two sentences set1 = count1 and set2 = count2 where 
+            # set1 is a subset of set2, then we can construct the new sentence:
+            # set2 - set1 = count2 - count1
+            # Sorting by the number of cells means set1 can only be a proper
+            # subset of set2 when set2 comes later and has strictly more cells
+            copy_knowledge = sorted(
+                (sentence.cells.bit_count(), sentence.cells, sentence.count)
+                for sentence in self.knowledge
+            )
+            for a in range(len(copy_knowledge)):
+                size1, set1, count1 = copy_knowledge[a]
+                for b in range(a + 1, len(copy_knowledge)):
+                    size2, set2, count2 = copy_knowledge[b]
+                    if size1 < size2 and (set1 & set2) == set1:
+                        self.add_sentence(Sentence(set2 & ~set1, count2 - count1))
+
+            # Sentences added late in the pass were not paired with the others,
+            # so run again until the knowledge base stops changing
+            if self.version == version:
+                return
 
     def add_knowledge(self, cell, count):
         """
@@ -194,66 +382,34 @@ class MinesweeperAI():
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
         """
-        def mark_mine_or_safe():
-            # Mark any additional cells as safe or as mines
-            # if it can be concluded based on the AI's knowledge base
-            copy_knowledge = self.knowledge.copy()
-            while copy_knowledge:
-                sentence = copy_knowledge.pop()
-                for safe_cell in sentence.known_safes().copy():
-                    self.mark_safe(safe_cell)
-                for mine_cell in sentence.known_mines().copy():
-                    self.mark_mine(mine_cell)
-                # The for need to be a copy of the set returned from 
-                # know_safes or known_mines because it'll be modified
+        bit = self.cell_to_bit(cell)
 
         # 1) Mark the cell as one of the moves made in the game
-        self.moves_made.add(cell)
+        self.moves_made |= bit
 
         # 2) Mark the cell as a safe cell, 
         # updating any sentences that contain the cell as well
-        self.mark_safe(cell)
+        self.mark_safe(bit)
 
         # 3) Add a new sentence to the AI’s knowledge base, based on the value of cell and count, 
         # to indicate that count of the cell’s neighbors are mines. Only include cells 
         # whose state is still undetermined in the sentence
         i, j = cell
-        cells = set()
-        new_count = count
-        for x in range(-1, 2):
-            for y in range(-1, 2):
-                if 0 <= i+x < self.height and 0 <= j+y < self.width:
-                    # for all cell’s neighbors
-                    nearby_cell = (i+x, j+y)
-                    if nearby_cell not in (self.safes | self.moves_made) and nearby_cell != cell:
-                        if nearby_cell in self.mines:
-                            new_count -= 1
-                        else:
-                            cells.add(nearby_cell)
-        sentence = Sentence(cells, new_count)
-        if sentence not in self.knowledge:
-            self.knowledge.append(sentence)
-
-        # 4
-        mark_mine_or_safe()
-
-        self.knowledge = [sentence for sentence in self.knowledge if len(sentence.cells) > 0]
-        # Remove all sentences from the knowledge base that have 0 cells
-
-        # 5) Any time we have two sentences set1 = count1 and set2 = count2 where 
-        # set1 is a subset of set2, then we can construct the new sentence:
-        # set2 - set1 = count2 - count1
-        copy_knowledge = self.knowledge.copy()
-        while copy_knowledge:
-            sentence1 = copy_knowledge.pop()
-            set1, count1 = sentence1.cells, sentence1.count
-            for sentence2 in copy_knowledge:
-                set2, count2 = sentence2.cells, sentence2.count
-                if set1.issubset(set2):
-                    s = Sentence(set2 - set1, count2 - count1)
-                    if s not in self.knowledge:
-                        self.knowledge.append(s)
-            mark_mine_or_safe() # Maybe is possible to mark new mines or safe cells
+        mines = self.mines
+        neighbors = self.neighbor_mask[i * self.width + j]
+        new_count = count - (neighbors & mines).bit_count()
+        cells = neighbors & ~(self.safes | self.moves_made | mines)
+        # A sentence whose cells are all safe or all mines
+        # is resolved right away instead of being added
+        if new_count == 0:
+            self.mark_safes(cells)
+        elif new_count == cells.bit_count():
+            self.mark_mines(cells)
+        else:
+            self.add_sentence(Sentence(cells, new_count))
+
+        # 4) and 5)
+        self.infer()
 
     def make_safe_move(self):
         """
@@ -264,9 +420,9 @@ class MinesweeperAI():
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
-        moves = self.safes - (self.moves_made | self.mines)
+        moves = self.safes & ~(self.moves_made | self.mines)
         if moves:
-            return random.choice(tuple(moves))
+            return self.random_cell(moves)
         return None
 
     def make_random_move(self):
@@ -276,8 +432,7 @@ class MinesweeperAI():
             1) have not already been chosen, and
             2) are not known to be mines
         """
-        all_moves = {(i, j) for i in range(0, self.height) for j in range(0, self.width)}
-        moves = all_moves - (self.mines | self.moves_made)
+        moves = self.all_cells & ~(self.mines | self.moves_made)
         if moves:
-            return random.choice(tuple(moves))
+            return self.random_cell(moves)
         return None